@@ -1,102 +1,249 @@
-import urllib.request
-import urllib.parse
-import json
+import os
+import numpy as np
 import pandas as pd
-from datetime import date, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+try:
+    import orjson as _json  # much faster C decoder; parses the raw bytes directly
+except ImportError:
+    import json as _json    # stdlib json.loads also accepts bytes
 
 CDEC_JSON_URL = "https://cdec.water.ca.gov/dynamicapp/req/JSONDataServlet"
+CDEC_DATE_FORMAT = "%Y-%m-%d %H:%M"
 
-def fetch_cdec(station_id: str, sensor_num: int, dur_code: str, start: str, end: str) -> pd.DataFrame:
+# One shared session so every CDEC call reuses kept-alive TCP/TLS connections.
+# pool_maxsize covers the concurrent chunk fetches in fetch_all_in_chunks.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Settled calendar years are cached here as one parquet file per
+# (station, sensor, dur_code, year). The current and previous year are always
+# re-fetched (data there can still be incomplete or provisional), and empty
+# results are never cached.
+CACHE_DIR = ".cdec_cache"
+
+
+def _cacheable_year(start: str, end: str):
+    # Only whole calendar years older than last year are safe to cache
+    s, e = date.fromisoformat(start), date.fromisoformat(end)
+    if s == date(s.year, 1, 1) and e == date(s.year, 12, 31) and s.year < date.today().year - 1:
+        return s.year
+    return None
+
+
+def _cache_path(station_id: str, sensor_num: int, dur_code: str, year: int) -> str:
+    return os.path.join(CACHE_DIR, f"{station_id}_{sensor_num}_{dur_code}_{year}.parquet")
+
+
+def _request_cdec(station_id: str, sensor_nums: list, dur_code: str, start: str, end: str) -> dict:
     params = {
         "Stations": station_id,
-        "SensorNums": str(sensor_num),
+        "SensorNums": ",".join(str(s) for s in sensor_nums),
         "dur_code": dur_code,
         "Start": start,
         "End": end,
     }
-    url = CDEC_JSON_URL + "?" + urllib.parse.urlencode(params)
 
-    with urllib.request.urlopen(url) as resp:
-        payload = resp.read().decode("utf-8")
+    resp = _SESSION.get(CDEC_JSON_URL, params=params, timeout=30)
+    resp.raise_for_status()
 
-    data = json.loads(payload)
+    # Decode the body bytes as-is (no intermediate str from resp.json())
+    data = _json.loads(resp.content)
     if not data:
-        return pd.DataFrame(columns=["datetime", "value"])
+        return {s: pd.DataFrame(columns=["datetime", "value"]) for s in sensor_nums}
 
-    df = pd.DataFrame(data)
+    # CDEC JSON typically uses keys: "date" and "value". Build the frame
+    # column-wise from only the keys we use instead of every record field.
+    keys = ["date", "value"] if len(sensor_nums) == 1 else ["date", "value", "SENSOR_NUM"]
+    df = pd.DataFrame({k: [rec.get(k) for rec in data] for k in keys})
+    if len(sensor_nums) > 1 and df["SENSOR_NUM"].isna().any():
+        # Without the tag the rows can't be split per sensor; fail loudly rather
+        # than silently returning empty stage/flow frames
+        raise RuntimeError(
+            f"CDEC response for {station_id} sensors {sensor_nums} has records without SENSOR_NUM"
+        )
+
+    # Fixed-format parse is the fast path; anything it misses goes through inference
+    dt = pd.to_datetime(df["date"], format=CDEC_DATE_FORMAT, errors="coerce")
+    missed = dt.isna() & df["date"].notna()
+    if missed.any():
+        dt[missed] = pd.to_datetime(df.loc[missed, "date"], errors="coerce")
+    df["datetime"] = dt
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+
+    # Drop unparsable rows and the -9999 missing-data sentinel with one mask
+    value = df["value"].values
+    keep = df["datetime"].notna().values & df["value"].notna().values & (value != -9999)
+    df = df[keep]
+
+    if len(sensor_nums) == 1:
+        return {sensor_nums[0]: df[["datetime", "value"]].sort_values("datetime")}
+
+    # Multi-sensor responses tag every record with its "SENSOR_NUM"
+    sensor = pd.to_numeric(df["SENSOR_NUM"], errors="coerce")
+    return {
+        s: df.loc[sensor == int(s), ["datetime", "value"]].sort_values("datetime")
+        for s in sensor_nums
+    }
+
+
+def fetch_cdec_sensors(station_id: str, sensor_nums: list, dur_code: str, start: str, end: str) -> dict:
+    """
+    Fetch several sensors of one station in a single request (CDEC accepts a
+    comma-separated SensorNums list). Returns {sensor_num: DataFrame[datetime, value]}.
+    Whole, settled calendar years with data are served from / saved to the
+    parquet cache in CACHE_DIR.
+    """
+    year = _cacheable_year(start, end)
+    if year is None:
+        return _request_cdec(station_id, sensor_nums, dur_code, start, end)
 
-    # CDEC JSON typically uses keys: "date" and "value"
-    df["datetime"] = pd.to_datetime(df.get("date"), errors="coerce")
-    df["value"] = pd.to_numeric(df.get("value"), errors="coerce")
+    out = {}
+    for s in sensor_nums:
+        path = _cache_path(station_id, s, dur_code, year)
+        if os.path.exists(path):
+            out[s] = pd.read_parquet(path)
 
-    df = df[df["datetime"].notna() & df["value"].notna()]
-    df = df[df["value"] != -9999]
+    missing = [s for s in sensor_nums if s not in out]
+    if missing:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for s, df in _request_cdec(station_id, missing, dur_code, start, end).items():
+            out[s] = df
+            if df.empty:
+                # No negative entries: an empty probe year (or a transient []) stays re-fetchable
+                continue
+            # Write then rename so an interrupted run never leaves a partial file
+            path = _cache_path(station_id, s, dur_code, year)
+            df.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
 
-    return df[["datetime", "value"]].sort_values("datetime")
+    return {s: out[s] for s in sensor_nums}
+
+
+def fetch_cdec(station_id: str, sensor_num: int, dur_code: str, start: str, end: str) -> pd.DataFrame:
+    return fetch_cdec_sensors(station_id, [sensor_num], dur_code, start, end)[sensor_num]
 
 
 def find_earliest_date(station_id: str, sensor_num: int, dur_code: str) -> date:
     """
-    Finds the earliest date with data by probing decades, then narrowing.
+    Finds the earliest date with data by binary-searching the years 1900..today
+    for the first calendar year that returns any data (assumes the record is
+    continuous from its first year onward). A probe whose data starts after
+    the first days of January ends the search early if the year before it is empty.
     """
-    # Broad probes (go back to 1900 to be safe)
-    probe_years = [1900, 1930, 1950, 1970, 1980, 1990, 2000, 2010]
     today = date.today()
+    lo, hi = 1900, today.year
 
     earliest_found = None
-    for y in probe_years:
-        start = date(y, 1, 1)
-        end = date(y, 12, 31)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        start = date(mid, 1, 1)
+        end = date(mid, 12, 31)
         df = fetch_cdec(station_id, sensor_num, dur_code, start.isoformat(), end.isoformat())
-        if not df.empty:
+        if df.empty:
+            lo = mid + 1
+        else:
+            # Every later hit is an earlier year, so it always replaces this one
             earliest_found = df["datetime"].min().date()
-            break
+            if earliest_found > date(mid, 1, 3):
+                # Data starts part-way through the year: either the record began
+                # here or January just had an outage. Only stop once the previous
+                # year is confirmed empty.
+                prev = fetch_cdec(station_id, sensor_num, dur_code,
+                                  date(mid - 1, 1, 1).isoformat(), date(mid - 1, 12, 31).isoformat())
+                if prev.empty:
+                    break
+            hi = mid - 1
 
     if earliest_found is None:
-        # If nothing in early probes, do a fallback recent probe
-        df = fetch_cdec(station_id, sensor_num, dur_code, "2000-01-01", today.isoformat())
-        if df.empty:
-            raise RuntimeError(f"No data found for {station_id} sensor {sensor_num} dur {dur_code}")
-        return df["datetime"].min().date()
-
-    # Narrow down year-by-year to get the earliest year precisely
-    y = earliest_found.year
-    while y > 1900:
-        prev_start = date(y - 1, 1, 1)
-        prev_end = date(y - 1, 12, 31)
-        df_prev = fetch_cdec(station_id, sensor_num, dur_code, prev_start.isoformat(), prev_end.isoformat())
-        if df_prev.empty:
-            break
-        earliest_found = df_prev["datetime"].min().date()
-        y -= 1
+        raise RuntimeError(f"No data found for {station_id} sensor {sensor_num} dur {dur_code}")
 
     return earliest_found
 
 
-def fetch_all_in_chunks(station_id: str, sensor_num: int, dur_code: str,
+def _concat_chunks(frames: list) -> pd.DataFrame:
+    # Each chunk is sorted and chunks are in chronological order, so the concat
+    # is already sorted and duplicates can only sit next to each other.
+    out = pd.concat(frames, ignore_index=True)
+    if out.empty:
+        return out
+
+    dt = out["datetime"].values
+    keep = np.concatenate(([True], dt[1:] != dt[:-1]))
+    return out[keep]
+
+
+def fetch_all_in_chunks(station_id: str, sensor_nums: list, dur_code: str,
                         start_date: date, end_date: date,
-                        chunk_days: int = 365) -> pd.DataFrame:
+                        max_workers: int = 8) -> dict:
     """
-    Pull all data from start_date to end_date in chunks to avoid timeouts/limits.
+    Pull all data from start_date to end_date in calendar-year chunks to avoid
+    timeouts/limits (whole years line up with the find_earliest_date probes, so
+    they hit the same cache). All sensors are requested together per chunk, and
+    chunks are requested concurrently, at most max_workers at a time.
+    Returns {sensor_num: DataFrame}.
     """
-    frames = []
-    cur = start_date
+    chunks = [
+        (date(y, 1, 1), min(date(y, 12, 31), end_date))
+        for y in range(start_date.year, end_date.year + 1)
+    ]
 
-    while cur <= end_date:
-        chunk_end = min(cur + timedelta(days=chunk_days), end_date)
-        df = fetch_cdec(station_id, sensor_num, dur_code, cur.isoformat(), chunk_end.isoformat())
-        frames.append(df)
-        print(f"{station_id} sensor {sensor_num}: {cur} to {chunk_end} -> {len(df)} rows")
-        cur = chunk_end + timedelta(days=1)
+    if not chunks:
+        return {s: pd.DataFrame(columns=["datetime", "value"]) for s in sensor_nums}
 
-    if not frames:
-        return pd.DataFrame(columns=["datetime", "value"])
+    def fetch_chunk(chunk):
+        chunk_start, chunk_end = chunk
+        return fetch_cdec_sensors(station_id, sensor_nums, dur_code, chunk_start.isoformat(), chunk_end.isoformat())
 
-    out = pd.concat(frames, ignore_index=True)
-    out = out.drop_duplicates(subset=["datetime"]).sort_values("datetime")
+    frames = {s: [] for s in sensor_nums}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # map() yields in submission order, so progress still prints chronologically
+        for (chunk_start, chunk_end), by_sensor in zip(chunks, pool.map(fetch_chunk, chunks)):
+            for s in sensor_nums:
+                frames[s].append(by_sensor[s])
+            rows = ", ".join(f"sensor {s}={len(by_sensor[s])}" for s in sensor_nums)
+            print(f"{station_id}: {chunk_start} to {chunk_end} -> {rows} rows")
+
+    # The first chunk is a whole year; drop anything before the requested start
+    out = {}
+    for s in sensor_nums:
+        df = _concat_chunks(frames[s])
+        out[s] = df[df["datetime"] >= pd.Timestamp(start_date)] if not df.empty else df
     return out
 
 
+def _csv_column(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Per column: categoricals become plain strings; timestamps are written as dates
+    # when every value is midnight (like to_csv), else at whole seconds when lossless.
+    if pa.types.is_dictionary(col.type):
+        return col.cast(col.type.value_type)
+    if pa.types.is_timestamp(col.type):
+        for target in (pa.date32(), pa.timestamp("s")):
+            narrowed = col.cast(target, safe=False)
+            if pc.all(pc.equal(narrowed.cast(col.type), col)).as_py():
+                return narrowed
+    return col
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    """
+    Write df to CSV with Arrow's column-wise C writer (much faster than
+    DataFrame.to_csv on large frames). Differences from to_csv: the header and
+    every string value are quoted, and floats use Arrow's shortest form, so
+    whole numbers lose their ".0" (274.0 -> 274). Timestamps keep the to_csv
+    layout unless a column has sub-second values.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = pa.table([_csv_column(c) for c in table.columns], names=table.column_names)
+    pa_csv.write_csv(table, path)
+
+
 def export_station_all_time(station_id: str, out_csv: str):
     # For LCH: stage=1, flow=20 (event data)
     dur_code = "E"
@@ -112,18 +259,19 @@ def export_station_all_time(station_id: str, out_csv: str):
     print(f"Using start   : {start_date}")
     print(f"Using end     : {today}")
 
-    stage = fetch_all_in_chunks(station_id, 1, dur_code, start_date, today, chunk_days=365)
-    flow  = fetch_all_in_chunks(station_id, 20, dur_code, start_date, today, chunk_days=365)
+    # One request per chunk returns both sensors; split back into stage and flow
+    series = fetch_all_in_chunks(station_id, [1, 20], dur_code, start_date, today)
 
-    stage = stage.rename(columns={"value": "stage_ft"})
-    flow  = flow.rename(columns={"value": "flow_cfs"})
+    stage = series[1].rename(columns={"value": "stage_ft"})
+    flow  = series[20].rename(columns={"value": "flow_cfs"})
 
-    combined = pd.merge(stage, flow, on="datetime", how="outer").sort_values("datetime")
+    # Both series come back sorted by datetime, so an ordered merge needs no re-sort
+    combined = pd.merge_ordered(stage, flow, on="datetime", how="outer")
 
     # Save CSVs
-    combined.to_csv(out_csv, index=False)
-    stage.to_csv("LCH_stage_ALL.csv", index=False)
-    flow.to_csv("LCH_flow_ALL.csv", index=False)
+    write_csv(combined, out_csv)
+    write_csv(stage, "LCH_stage_ALL.csv")
+    write_csv(flow, "LCH_flow_ALL.csv")
 
     print(f"\nSaved: {out_csv}")
     print(f"Rows: combined={len(combined)}, stage={len(stage)}, flow={len(flow)}")
@@ -2,7 +2,7 @@ import pandas as pd
 
 # Load CSV (file path or URL)
 source = "your_cdec_file_or_url.csv"
-df = pd.read_csv(source)
+df = pd.read_csv(source, engine="pyarrow")
 
 # Clean column names
 df.columns = df.columns.str.strip()
@@ -11,20 +11,24 @@ import re
 
 DEFAULT_VALUE_KEYWORDS = ["flow", "stream", "discharge", "cfs"]
 
+# Compiled once; used to scan column names for datetime/value candidates
+_DT_RE = re.compile(r"date|time", re.I)
+_VAL_RE = re.compile("|".join(map(re.escape, DEFAULT_VALUE_KEYWORDS)), re.I)
+
 def find_datetime_and_value_columns(df: pd.DataFrame, datetime_col_hint: str = None, value_col_hint: str = None):
     # If user provided explicit names, prefer those (if present)
     if datetime_col_hint and datetime_col_hint in df.columns:
         dt_col = datetime_col_hint
     else:
         # common names for datetime
-        candidates = [c for c in df.columns if re.search(r"date|time", c, flags=re.I)]
+        candidates = [c for c in df.columns if _DT_RE.search(c)]
         dt_col = candidates[0] if candidates else None
 
     if value_col_hint and value_col_hint in df.columns:
         val_col = value_col_hint
     else:
         # try to find any column with a keyword like "flow" or "cfs"
-        candidates = [c for c in df.columns if any(k in c.lower() for k in DEFAULT_VALUE_KEYWORDS)]
+        candidates = [c for c in df.columns if _VAL_RE.search(c)]
         if candidates:
             val_col = candidates[0]
         else:
@@ -54,14 +58,24 @@ def load_wdl_csv(path, sep=",", sheet_name=None):
         # Text file: use comment="#" so pandas skips lines starting with '#'
         # Use usecols=[0,1] to only read the first two columns (Date Time and Flow).
         # This avoids malformed extra commas in trailing columns (e.g. Quality Code).
-        df = pd.read_csv(
-            path,
+        sep = "\t" if sep == r"\t" else sep
+        read_kwargs = dict(
             sep=sep,
             comment="#",
-            engine="python",
             usecols=[0, 1],      # <-- read only the first two columns
             dtype=str            # read as strings initially (parsing later)
         )
+        df = None
+        if len(sep) == 1:
+            try:
+                # Fast path: the C parser supports comment/usecols (pyarrow does not)
+                df = pd.read_csv(path, engine="c", **read_kwargs)
+            except pd.errors.ParserError:
+                pass
+        if df is None:
+            # Multi-character/regex separators or malformed rows: use the slower
+            # but more forgiving python parser
+            df = pd.read_csv(path, engine="python", **read_kwargs)
         # Trim whitespace from headers (sometimes WDL headers have leading/trailing spaces)
         df.columns = [c.strip() for c in df.columns]
         return df
@@ -73,13 +87,22 @@ def summarize_by_year(df: pd.DataFrame, datetime_col: str, value_col: str) -> pd
     if value_col not in df.columns:
         raise ValueError(f"Value column '{value_col}' not found in data columns: {list(df.columns)}")
 
-    # Parse datetimes robustly
-    dt = pd.to_datetime(df[datetime_col], errors="coerce", infer_datetime_format=True)
-    if dt.isna().all():
-        # try common US formats explicitly
-        dt = pd.to_datetime(df[datetime_col], format="%m/%d/%Y %H:%M", errors="coerce")
-    if dt.isna().all():
-        dt = pd.to_datetime(df[datetime_col], format="%m/%d/%Y %H:%M:%S", errors="coerce")
+    # Parse datetimes robustly: the common US formats are the fast path and are
+    # used when they parse every value; otherwise fall back to format inference.
+    raw = df[datetime_col]
+    dt = None
+    partial = []
+    for fmt in ("%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S"):
+        parsed = pd.to_datetime(raw, format=fmt, errors="coerce")
+        if not (parsed.isna() & raw.notna()).any():
+            dt = parsed
+            break
+        partial.append(parsed)
+    if dt is None:
+        dt = pd.to_datetime(raw, errors="coerce", infer_datetime_format=True)
+        if dt.isna().all():
+            # inference found nothing: keep whichever explicit format parsed something
+            dt = next((p for p in partial if p.notna().any()), dt)
 
     if dt.isna().all():
         raise ValueError(f"Could not parse datetimes from column '{datetime_col}' (first 10 values shown):\n{df[datetime_col].head(10)}")
@@ -89,27 +112,33 @@ def summarize_by_year(df: pd.DataFrame, datetime_col: str, value_col: str) -> pd
     work = pd.DataFrame({"datetime": dt, "value": vals}).dropna(subset=["datetime", "value"])
     if work.empty:
         raise ValueError("No rows left after parsing datetimes and numeric values. Check your input file/columns.")
-    work["Year"] = work["datetime"].dt.year
+    # Years since 1970, shifted to calendar years; int32 like .dt.year
+    work["Year"] = work["datetime"].values.astype("datetime64[Y]").astype("int32") + 1970
 
     g = work.groupby("Year")["value"]
 
-    out = pd.DataFrame({
-        "Year": g.mean().index,
-        "Average Flow Rate (CFS)": g.mean().values,
-        "Max Flow Rate (CFS)": g.max().values,
-        "Min Flow Rate (CFS)": g.min().values,
-        "Median(CFS)": g.median().values,
-        "25%": g.quantile(0.25).values,
-        "50%": g.quantile(0.50).values,
-        "95%": g.quantile(0.95).values,
-        "99%": g.quantile(0.99).values,
+    # Median(CFS) is the 50th percentile, taken from the same quantile call
+    stats = g.agg(["mean", "max", "min"])
+    pct = g.quantile([0.25, 0.50, 0.95, 0.99]).unstack()
+
+    # Both results share the (sorted) Year index: join column-wise, rename once
+    out = pd.concat([stats, pct], axis=1).rename(columns={
+        "mean": "Average Flow Rate (CFS)",
+        "max": "Max Flow Rate (CFS)",
+        "min": "Min Flow Rate (CFS)",
+        0.25: "25%",
+        0.50: "50%",
+        0.95: "95%",
+        0.99: "99%",
     })
+    out.insert(3, "Median(CFS)", out["50%"])
+    out = out.reset_index()
 
     # Round numbers for neatness
     numeric_cols = [c for c in out.columns if c != "Year"]
     out[numeric_cols] = out[numeric_cols].round(6)
 
-    out = out.sort_values("Year").reset_index(drop=True)
+    # groupby already returns the years in ascending order
     return out
 
 def main():
@@ -10,64 +10,158 @@ import argparse
 import glob
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-
-
-def _norm_cols(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-    return df
-
-
-def load_onerain_txt(path: str) -> pd.DataFrame:
-    # Read tab-delimited, tolerate weird quoting
-    df = pd.read_csv(path, sep="\t", engine="python")
-    df = _norm_cols(df)
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+
+# The low-cardinality text columns are dictionary-encoded -> pandas Categorical
+# after to_pandas().
+_LABEL = pa.dictionary(pa.int32(), pa.string())
+
+ONERAIN_SCHEMA = pa.schema([
+    ("Reading", pa.timestamp("ns")),
+    ("Receive", pa.timestamp("ns")),
+    ("Value", pa.float64()),
+    ("Unit", _LABEL),
+    ("DataQuality", _LABEL),
+])
+
+
+def _norm_name(c: str) -> str:
+    return c.strip().lower().replace(" ", "_")
+
+
+def _as_timestamp(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # The CSV reader already parsed known timestamp layouts; anything else goes through pandas
+    if pa.types.is_timestamp(col.type) or pa.types.is_null(col.type):
+        return col.cast(pa.timestamp("ns"))
+    parsed = pd.to_datetime(col.to_pandas(), errors="coerce")
+    return pa.chunked_array([pa.array(parsed, type=pa.timestamp("ns"))])
+
+
+def _as_float(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Numeric columns cast directly; text (e.g. "---" placeholders) is coerced to null
+    if pa.types.is_integer(col.type) or pa.types.is_floating(col.type) or pa.types.is_null(col.type):
+        return col.cast(pa.float64())
+    parsed = pd.to_numeric(col.to_pandas(), errors="coerce").astype("float64")
+    return pa.chunked_array([pa.array(parsed, type=pa.float64())])
+
+
+def _label_equals(col: pa.ChunkedArray, wanted: str) -> pa.ChunkedArray:
+    # Trim + compare only the few distinct labels of each dictionary chunk,
+    # then broadcast the result to the rows through the indices.
+    return pa.chunked_array(
+        [pc.take(pc.equal(pc.utf8_trim_whitespace(c.dictionary), wanted), c.indices) for c in col.chunks],
+        type=pa.bool_(),
+    )
+
+
+def load_onerain_txt(path: str, quality: str = "", unit: str = "") -> pa.Table:
+    # Read tab-delimited straight into Arrow columns (no per-file DataFrame).
+    # Files are loaded in parallel processes, so keep each read single-threaded.
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(use_threads=False),
+        parse_options=pa_csv.ParseOptions(delimiter="\t"),
+        # Let the reader parse Reading/Receive natively for the usual layouts
+        convert_options=pa_csv.ConvertOptions(
+            timestamp_parsers=[pa_csv.ISO8601, "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M"],
+        ),
+    )
+    table = table.rename_columns([_norm_name(c) for c in table.column_names])
 
     # Expected normalized names
     required = ["reading", "receive", "value", "unit", "data_quality"]
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in required if c not in table.column_names]
     if missing:
         raise ValueError(
             f"File '{os.path.basename(path)}' missing columns {missing}. "
-            f"Found: {list(df.columns)}"
+            f"Found: {table.column_names}"
         )
 
-    out = df[["reading", "receive", "value", "unit", "data_quality"]].copy()
-    out.columns = ["Reading", "Receive", "Value", "Unit", "DataQuality"]
-
-    out["Reading"] = pd.to_datetime(out["Reading"], errors="coerce")
-    out["Receive"] = pd.to_datetime(out["Receive"], errors="coerce")
-    out["Value"] = pd.to_numeric(out["Value"], errors="coerce")
-
-    out = out.dropna(subset=["Reading", "Value"])
-    out["SourceFile"] = os.path.basename(path)
-    return out
+    reading = _as_timestamp(table["reading"])
+    value = _as_float(table["value"])
+    unit_col = pc.dictionary_encode(table["unit"].cast(pa.string()))
+    quality_col = pc.dictionary_encode(table["data_quality"].cast(pa.string()))
+
+    keep = pc.and_(pc.is_valid(reading), pc.is_valid(value))
+    # Apply the optional --quality/--unit filters per file, before the combine
+    if quality:
+        keep = pc.and_(keep, _label_equals(quality_col, quality))
+    if unit:
+        keep = pc.and_(keep, _label_equals(unit_col, unit))
+
+    out = pa.Table.from_arrays(
+        [
+            reading,
+            _as_timestamp(table["receive"]),
+            value,
+            unit_col,
+            quality_col,
+        ],
+        schema=ONERAIN_SCHEMA,
+    )
+
+    out = out.filter(keep)
+    source = pa.DictionaryArray.from_arrays(
+        pa.array(np.zeros(out.num_rows, dtype=np.int32)),
+        pa.array([os.path.basename(path)]),
+    )
+    return out.append_column("SourceFile", source)
 
 
 def summarize_by_year(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    df["Year"] = df["Reading"].dt.year
+    # Calendar year of each reading
+    df["Year"] = df["Reading"].values.astype("datetime64[Y]").astype("int32") + 1970
 
     g = df.groupby("Year")["Value"]
 
-    out = pd.DataFrame({
-        "Year": g.mean().index,
-        "Mean": g.mean().values,
-        "Max": g.max().values,
-        "Min": g.min().values,
-        "Median": g.median().values,
-        "25%": g.quantile(0.25).values,
-        "50%": g.quantile(0.50).values,
-        "95%": g.quantile(0.95).values,
-        "99%": g.quantile(0.99).values,
-        "N": g.size().values,
-    })
+    # mean/max/min/N in one named agg; every percentile in one quantile call
+    stats = g.agg(Mean="mean", Max="max", Min="min", N="size")
+    pct = g.quantile([0.25, 0.50, 0.95, 0.99]).unstack()
+    pct.columns = ["25%", "50%", "95%", "99%"]
+
+    # Both results share the (sorted) Year index, so this is a column-wise join
+    out = pd.concat([stats, pct], axis=1)
+    out["Median"] = out["50%"]
+    out = out[["Mean", "Max", "Min", "Median", "25%", "50%", "95%", "99%", "N"]].reset_index()
 
     num_cols = [c for c in out.columns if c not in ("Year", "N")]
     out[num_cols] = out[num_cols].round(6)
 
-    return out.sort_values("Year").reset_index(drop=True)
+    # groupby already returns the years in ascending order
+    return out
+
+
+def _csv_column(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Per column: categoricals become plain strings; timestamps are written as dates
+    # when every value is midnight (like to_csv), else at whole seconds when lossless.
+    if pa.types.is_dictionary(col.type):
+        return col.cast(col.type.value_type)
+    if pa.types.is_timestamp(col.type):
+        for target in (pa.date32(), pa.timestamp("s")):
+            narrowed = col.cast(target, safe=False)
+            if pc.all(pc.equal(narrowed.cast(col.type), col)).as_py():
+                return narrowed
+    return col
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    """
+    Write df to CSV with Arrow's column-wise C writer (much faster than
+    DataFrame.to_csv on large frames). Differences from to_csv: the header and
+    every string value are quoted, and floats use Arrow's shortest form, so
+    whole numbers lose their ".0" (274.0 -> 274). Timestamps keep the to_csv
+    layout unless a column has sub-second values.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = pa.table([_csv_column(c) for c in table.columns], names=table.column_names)
+    pa_csv.write_csv(table, path)
 
 
 def main():
@@ -85,31 +179,32 @@ def main():
     if not files:
         raise FileNotFoundError(f"No files matched: {os.path.join(args.input_dir, args.pattern)}")
 
-    frames = []
-    for f in files:
-        try:
-            frames.append(load_onerain_txt(f))
-        except Exception as e:
-            print(f"WARNING: Skipping '{f}' due to error: {e}", file=sys.stderr)
-
-    if not frames:
+    # Files are independent: parse them in worker processes, collect in file order
+    tables = []
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        futures = [(f, ex.submit(load_onerain_txt, f, args.quality, args.unit)) for f in files]
+        for f, fut in futures:
+            try:
+                tables.append(fut.result())
+            except Exception as e:
+                print(f"WARNING: Skipping '{f}' due to error: {e}", file=sys.stderr)
+
+    if not tables:
         raise ValueError("No files could be loaded. Check the delimiter/format and headers.")
 
-    combined = pd.concat(frames, ignore_index=True)
-
-    if args.quality:
-        combined = combined[combined["DataQuality"].astype(str).str.strip().eq(args.quality)].copy()
-    if args.unit:
-        combined = combined[combined["Unit"].astype(str).str.strip().eq(args.unit)].copy()
+    # Per-file tables share ONERAIN_SCHEMA, so this is a zero-copy column concat;
+    # the only DataFrame is built once from the combined columns. Each file has its
+    # own dictionaries; to_pandas() unifies them into one set of categories.
+    combined = pa.concat_tables(tables).to_pandas()
 
     if combined.empty:
         raise ValueError("After filtering, no data remained. Remove filters or verify values.")
 
-    combined.to_csv(args.combined_out, index=False)
+    write_csv(combined, args.combined_out)
     print(f"Wrote combined: {args.combined_out} (rows={len(combined)})")
 
     summary = summarize_by_year(combined)
-    summary.to_csv(args.summary_out, index=False)
+    write_csv(summary, args.summary_out)
     print(f"Wrote summary:  {args.summary_out} (years={summary['Year'].nunique()})")
 
 